@@ -20,24 +20,38 @@
 import sys
 import os
 import datetime
+import re
 import hashlib
-from flask import Flask, redirect, send_from_directory, request
+import time
+import uuid
+from flask import Flask, Response, current_app, make_response, send_file, send_from_directory, request
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from flask_cors import CORS
 try:
     from flask_admin import Admin
     from flask_admin.contrib import sqla
 except:
     print("Failed to import flask-admin")
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from safrs import SAFRSAPI, SAFRSRestAPI  # api factory
 from safrs import SAFRSBase  # db Mixin
 from safrs import SAFRSFormattedResponse, jsonapi_format_response, log, paginate
 from safrs import jsonapi_attr, ValidationError
 from safrs import jsonapi_rpc  # rpc decorator
+from safrs import SAFRSJSONEncoder
 from safrs.api_methods import search, startswith, duplicate  # rpc methods
 from flask import url_for, jsonify
 from functools import wraps
 
+# Add startswith methods so we can perform lookups from the frontend
+SAFRSBase.startswith = startswith
+# Needed because we don't want to implicitly commit when using flask-admin
+SAFRSBase.db_commit = False
+
 # This html will be rendered in the swagger UI
 description = """
 <a href=http://jsonapi.org>Json:API</a> compliant API built with https://github.com/thomaxxl/safrs <br/>
@@ -56,6 +70,105 @@ def testd(*args, **kwargs):
         return result
     return testd
 
+
+class ORJSONEncoder(SAFRSJSONEncoder):
+    """
+        Serialize the responses with orjson instead of the stdlib json module,
+        objects orjson doesn't know about are passed to SAFRSJSONEncoder.default
+        (datetimes are passed through too, so they're formatted the safrs way)
+    """
+
+    def encode(self, obj):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+
+def cached_view(view_func):
+    """
+        Cache the response body of a view that always returns the same content,
+        the view is only called for the first request
+    """
+    cache = {}
+
+    @wraps(view_func)
+    def cached(*args, **kwargs):
+        if "data" not in cache:
+            response = make_response(view_func(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            cache["data"] = response.get_data()
+            cache["mimetype"] = response.mimetype
+        return Response(cache["data"], mimetype=cache["mimetype"])
+
+    return cached
+
+
+def hash_static_file(filename):
+    """
+        :return: (absolute file path, (mtime, size), etag) of a static file
+    """
+    stat = os.stat(filename)
+    with open(filename, "rb") as static_file:
+        etag = hashlib.blake2b(static_file.read(), digest_size=8).hexdigest()
+    return filename, (stat.st_mtime, stat.st_size), etag
+
+
+def static_files(directory):
+    """
+        Resolve the paths and hash the contents of the (static) files in directory once, at startup
+        :return: dict of relative file path -> (absolute file path, (mtime, size), etag)
+    """
+    result = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            filename = os.path.join(root, name)
+            result[os.path.relpath(filename, directory)] = hash_static_file(filename)
+    return result
+
+
+def send_static(directory, path, files):
+    """
+        Send a file from the precomputed static files:
+        return "304 Not Modified" without reading the file if the client already has it.
+        Files that have been replaced since they were hashed (different mtime or size) are hashed again,
+        so every request still stats the file: only the path resolution and hashing are done at startup.
+        Paths that weren't found in directory at startup are handled by send_from_directory
+    """
+    # files is shared between the request threads: look up and remove entries atomically
+    entry = files.get(path)
+    if entry is None:
+        return send_from_directory(directory, path)
+    filename, file_stat, etag = entry
+    try:
+        stat = os.stat(filename)
+        if (stat.st_mtime, stat.st_size) != file_stat:
+            filename, file_stat, etag = files[path] = hash_static_file(filename)
+    except OSError:
+        # the file has been removed
+        files.pop(path, None)
+        return send_from_directory(directory, path)
+
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        # same cache headers as send_file
+        max_age = current_app.get_send_file_max_age(filename)
+        if max_age is None:
+            response.cache_control.no_cache = True
+        else:
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            response.expires = int(time.time() + max_age)
+    else:
+        # the etag generated by send_file is replaced by ours below
+        response = send_file(filename, conditional=True)
+    response.set_etag(etag)
+    return response
+
+
 db = SQLAlchemy()
 
 # SQLAlchemy Mixin Superclass with multiple inheritance
@@ -89,6 +202,14 @@ class DocumentedColumn(db.Column):
     sample = "my custom value"
 
 
+class CreatedColumn(db.Column):
+    """
+        Creation timestamp column, the "sample" is shown in the swagger example
+        (safrs can't show the callable column default)
+    """
+    sample = "2020-10-20 12:00:00.000000"
+
+
 # Customized relationships
 
 
@@ -116,8 +237,8 @@ class Book(BaseModel):
     """
 
     __tablename__ = "Books"
-    id = db.Column(db.String, primary_key=True)
-    title = db.Column(db.String, default="")
+    id = db.Column(db.String(36), primary_key=True)
+    title = db.Column(db.String(200), default="")
     reader_id = db.Column(db.Integer, db.ForeignKey("People.id"))
     author_id = db.Column(db.Integer, db.ForeignKey("People.id"))
     publisher_id = db.Column(db.Integer, db.ForeignKey("Publishers.id"))
@@ -133,8 +254,8 @@ class Person(BaseModel):
 
     __tablename__ = "People"
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, default="John Doe")
-    email = db.Column(db.String, default="")
+    name = db.Column(db.String(200), default="John Doe")
+    email = db.Column(db.String(200), default="")
     comment = DocumentedColumn(db.Text, default="my empty comment")
     dob = db.Column(db.Date)
     books_read = db.relationship("Book", backref="reader", foreign_keys=[Book.reader_id], cascade="save-update, merge")
@@ -193,7 +314,7 @@ class Publisher(BaseModel):
 
     __tablename__ = "Publishers"
     id = db.Column(db.Integer, primary_key=True)  # Integer pk instead of str
-    name = db.Column(db.String, default="")
+    name = db.Column(db.String(200), default="")
     # books = db.relationship("Book", back_populates="publisher", lazy="dynamic")
     books = db.relationship("Book", back_populates="publisher")
     employees = hiddenRelationship(Person, back_populates="employer")
@@ -236,47 +357,64 @@ class Review(BaseModel):
     """
 
     __tablename__ = "Reviews"
-    book_id = db.Column(db.String, db.ForeignKey("Books.id"), primary_key=True)
+    book_id = db.Column(db.String(36), db.ForeignKey("Books.id"), primary_key=True)
     reader_id = db.Column(db.Integer, db.ForeignKey("People.id", ondelete="CASCADE"), primary_key=True)
-    review = db.Column(db.String, default="")
-    created = db.Column(db.DateTime, default=datetime.datetime.now())
+    review = db.Column(db.String(200), default="")
+    created = CreatedColumn(db.DateTime, default=datetime.datetime.now)
     http_methods = {"GET", "POST"}  # only allow GET and POST
 
 
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+        The demo db is an in-memory sqlite db: journaling and syncing to disk is of no use
+        (use journal_mode=WAL instead of MEMORY for a file-backed db)
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+
 # API app initialization:
 # Create the instances and exposes the classes
 
 
 def start_api(swagger_host="0.0.0.0", PORT=None):
-
-    # Add startswith methods so we can perform lookups from the frontend
-    SAFRSBase.startswith = startswith
-    # Needed because we don't want to implicitly commit when using flask-admin
-    SAFRSBase.db_commit = False
-
     with app.app_context():
         db.init_app(app)
+        event.listen(db.engine, "connect", set_sqlite_pragmas)
         db.create_all()
         # populate the database
-        NR_INSTANCES = 200
+        NR_INSTANCES = int(os.getenv("NR_INSTANCES", 200))  # can be scaled up for load testing
+        # hash a fixed size buffer: bytes(i) would allocate and hash i zero bytes
+        secrets = [hashlib.sha256(i.to_bytes(8, "little")).hexdigest() for i in range(NR_INSTANCES)]
+        people, books, publishers, reviews, friendships = [], [], [], [], []
         for i in range(NR_INSTANCES):
-            reader = Person(name="Reader " + str(i), email="reader@email" + str(i), password=hashlib.sha256(bytes(i)).hexdigest())
-            author = Person(name="Author " + str(i), email="author@email" + str(i), password=hashlib.sha256(bytes(i)).hexdigest())
-            book = Book(title="book_title" + str(i))
-            review = Review(reader_id=2*i+1, book_id=book.id, review=f"review {i}")
-            publisher = Publisher(name="publisher" + str(i))
-            publisher.books.append(book)
-            reader.books_read.append(book)
-            author.books_written.append(book)
-            reader.friends.append(author)
-            author.friends.append(reader)
-            if i % 20 == 0:
-                reader.comment = ""
-            for obj in [reader, author, book, publisher, review]:
-                db.session.add(obj)
-
-            db.session.commit()
-            
+            reader_id, author_id, publisher_id = 2 * i + 1, 2 * i + 2, i + 1
+            book_id = str(uuid.uuid4())  # Book has a string pk, safrs would generate a uuid
+            reader_comment = "" if i % 20 == 0 else "my empty comment"
+            people.append(dict(id=reader_id, name=f"Reader {i}", email=f"reader@email{i}", password=secrets[i], comment=reader_comment))
+            people.append(dict(id=author_id, name=f"Author {i}", email=f"author@email{i}", password=secrets[i], comment="my empty comment"))
+            books.append(dict(id=book_id, title=f"book_title{i}", reader_id=reader_id, author_id=author_id, publisher_id=publisher_id))
+            reviews.append(dict(reader_id=reader_id, book_id=book_id, review=f"review {i}"))
+            publishers.append(dict(id=publisher_id, name=f"publisher{i}"))
+            friendships.append(dict(friend_a_id=reader_id, friend_b_id=author_id))
+            friendships.append(dict(friend_a_id=author_id, friend_b_id=reader_id))
+
+        # Core inserts are executed with executemany, skipping the orm unit of work,
+        # the relationships are set through the foreign keys
+        for table, rows in [
+            (Publisher.__table__, publishers),
+            (Person.__table__, people),
+            (Book.__table__, books),
+            (Review.__table__, reviews),
+            (friendship, friendships),
+        ]:
+            db.session.execute(table.insert(), rows)
+        db.session.commit()
+
         custom_swagger = {
             "info": {"title": "My Customized Title"},
             "securityDefinitions": {"ApiKeyAuth": {"type": "apiKey", "in": "header", "name": "My-ApiKey"}},
@@ -290,12 +428,17 @@ def start_api(swagger_host="0.0.0.0", PORT=None):
             custom_swagger=custom_swagger,
             schemes=["http", "https"],
             description=description,
+            json_encoder=ORJSONEncoder if orjson else SAFRSJSONEncoder,
         )
 
         for model in [Person, Book, Review, Publisher]:
             # Create an API endpoint
             api.expose_object(model, method_decorators={"get":[testdec]})
 
+        # The swagger spec doesn't change once all objects have been exposed (and we don't filter it by api_key)
+        # so it can be served from a cache
+        app.view_functions["swagger"] = cached_view(app.view_functions["swagger"])
+
         # see if we can add the flask-admin views
         try:
             admin = Admin(app, url="/admin")
@@ -306,27 +449,43 @@ def start_api(swagger_host="0.0.0.0", PORT=None):
 
 
 API_PREFIX = "/api"  # swagger location
+# static frontend directories, resolved once instead of on every request
+JA_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), "..", "jsonapi-admin/build"))
+SE_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), "..", "swagger-editor"))
+JA_FILES = static_files(JA_DIR)
+SE_FILES = static_files(SE_DIR)
 app = Flask("SAFRS Demo App", template_folder="/home/thomaxxl/mysite/templates")
 app.secret_key = "not so secret"
-CORS(app, origins="*", allow_headers=["Content-Type", "Authorization", "Access-Control-Allow-Credentials"], supports_credentials=True)
-
-app.config.update(SQLALCHEMY_DATABASE_URI="sqlite:///", DEBUG=True)  # DEBUG will also show safrs log messages + exception messages
+# Only allow the origins the demo is served from, wildcard origins can't be combined with credentials anyway
+CORS_ORIGINS = re.compile(r"^https?://(localhost|127\.0\.0\.1|thomaxxl\.pythonanywhere\.com)(:\d+)?$")
+CORS(app, origins=CORS_ORIGINS, allow_headers=["Content-Type", "Authorization", "Access-Control-Allow-Credentials"], supports_credentials=True)
+
+app.config.update(
+    SQLALCHEMY_DATABASE_URI="sqlite:///",
+    SQLALCHEMY_TRACK_MODIFICATIONS=False,  # don't track the object modifications, we don't use the signals
+    # DEBUG will also show safrs log messages + exception messages
+    # Without DEBUG safrs leaves the 400/405/500 responses out of the swagger spec and
+    # the API error details are replaced by "(debug logging disabled)":
+    # set SAFRS_DEBUG=1 on the public demo host to keep them
+    DEBUG=os.getenv("SAFRS_DEBUG") == "1",
+)
 
 
 @app.route("/ja")  # React jsonapi frontend
 @app.route("/ja/<path:path>", endpoint="jsonapi_admin")
 def send_ja(path="index.html"):
-    return send_from_directory(os.path.join(os.path.dirname(__file__), "..", "jsonapi-admin/build"), path)
+    return send_static(JA_DIR, path, JA_FILES)
 
 
 @app.route("/swagger_editor/<path:path>", endpoint="swagger_editor")
 def send_swagger_editor(path="index.html"):
-    return send_from_directory(os.path.join(os.path.dirname(__file__), "..", "swagger-editor"), path)
+    return send_static(SE_DIR, path, SE_FILES)
 
 
 @app.route("/")
 def goto_api():
-    return redirect(API_PREFIX)
+    # plain 302 without the html body generated by flask.redirect
+    return Response(b"", status=302, headers={"Location": API_PREFIX})
 
 
 if __name__ == "__main__":
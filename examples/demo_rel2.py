@@ -81,6 +81,15 @@ class DocumentedColumn(db.Column):
     sample = "my custom value"
 
 
+class CreatedColumn(db.Column):
+    """
+        Creation timestamp column, the "sample" is shown in the swagger example
+        (safrs can't show the callable column default)
+    """
+
+    sample = "2020-10-20 12:00:00.000000"
+
+
 # Customized relationships
 
 
@@ -176,7 +185,7 @@ class Review(BaseModel):
     book_id = db.Column(db.Integer, db.ForeignKey("Books.id"), primary_key=True)
     reader_id = db.Column(db.Integer, db.ForeignKey("People.id", ondelete="CASCADE"), primary_key=True)
     review = db.Column(db.String, default="")
-    created = db.Column(db.DateTime, default=datetime.datetime.now())
+    created = CreatedColumn(db.DateTime, default=datetime.datetime.now)
     http_methods = {"GET", "POST"}  # only allow GET and POST
 
 
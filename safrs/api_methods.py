@@ -60,7 +60,7 @@ def startswith(cls, **kwargs):  # pragma: no cover
     try:
         instances = result.query
         links, instances, count = paginate(instances)
-        data = [item for item in instances]
+        data = instances
         meta = {}
         errors = None
         response = SAFRSFormattedResponse(data, meta, links, errors, count)
@@ -74,7 +74,7 @@ def startswith(cls, **kwargs):  # pragma: no cover
         try:
             instances = result.query.filter(column.like(value + "%"))
             links, instances, count = paginate(instances)
-            data = [item for item in instances]
+            data = instances
             meta = {}
             errors = None
             response = SAFRSFormattedResponse(data, meta, links, errors, count)
@@ -101,7 +101,7 @@ def search(cls, **kwargs):  # pragma: no cover
         result = cls.query.filter(or_(column.like("%" + query + "%") for column in cls._s_columns))
     instances = jsonapi_sort(result, cls)
     links, instances, count = paginate(instances)
-    data = [item for item in instances]
+    data = instances
     meta = {}
     errors = None
     response = SAFRSFormattedResponse(data, meta, links, errors, count)
@@ -121,7 +121,7 @@ def re_search(cls, **kwargs):  # pragma: no cover
     result = cls.query.filter(or_(column.op("regexp")(query) for column in cls._s_columns))
     instances = result
     links, instances, count = paginate(instances)
-    data = [item for item in instances]
+    data = instances
     meta = {}
     errors = None
     response = SAFRSFormattedResponse(data, meta, links, errors, count)